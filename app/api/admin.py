@@ -0,0 +1,314 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.sql import sqltypes
+from typing import Any, AsyncIterator, Dict, List, Optional
+from datetime import datetime
+from uuid import UUID
+from contextlib import aclosing
+import asyncio
+import csv
+import enum
+import io
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, get_db
+from app.core.responses import FastJSONResponse, dumps
+from app.core.security import decrypt_sensitive_batch
+from app.api.auth import get_current_user
+from app.models.user import User, UserRole
+from app.models.session import ChatSession
+from app.models.screening import ScreeningResult
+from app.services.analytics import mood_analytics
+
+router = APIRouter()
+
+class ExportResource(str, enum.Enum):
+    USERS = "users"
+    SESSIONS = "sessions"
+    SCREENINGS = "screenings"
+
+class ExportFormat(str, enum.Enum):
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.NDJSON: "application/x-ndjson",
+    ExportFormat.PARQUET: "application/vnd.apache.parquet",
+}
+
+# Columns, date-range column, owning user column and encrypted fields per export
+EXPORTS = {
+    ExportResource.USERS: {
+        "columns": [
+            User.id, User.anonymous_id, User.institution_code, User.year_of_study,
+            User.department, User.preferred_language, User.role, User.is_active,
+            User.is_anonymous, User.last_risk_assessment, User.created_at, User.last_active
+        ],
+        "timestamp": User.created_at,
+        "owner": None,
+        "encrypted": ["department"],
+    },
+    ExportResource.SESSIONS: {
+        "columns": [
+            ChatSession.id, ChatSession.user_id, ChatSession.session_type,
+            ChatSession.conversation_history, ChatSession.mood_scores,
+            ChatSession.crisis_flags, ChatSession.duration_minutes,
+            ChatSession.message_count, ChatSession.satisfaction_rating,
+            ChatSession.started_at, ChatSession.ended_at
+        ],
+        "timestamp": ChatSession.started_at,
+        "owner": ChatSession.user_id,
+        "encrypted": [],
+    },
+    ExportResource.SCREENINGS: {
+        "columns": [
+            ScreeningResult.id, ScreeningResult.user_id, ScreeningResult.phq9_score,
+            ScreeningResult.gad7_score, ScreeningResult.stress_score,
+            ScreeningResult.sleep_score, ScreeningResult.overall_risk_score,
+            ScreeningResult.risk_level, ScreeningResult.risk_factors,
+            ScreeningResult.recommended_actions, ScreeningResult.referral_needed,
+            ScreeningResult.assessed_at
+        ],
+        "timestamp": ScreeningResult.assessed_at,
+        "owner": ScreeningResult.user_id,
+        "encrypted": [],
+    },
+}
+
+def _resolve_institution(current_user: User, institution_code: Optional[str]) -> Optional[str]:
+    """Staff only; counselors are limited to their own institution.
+
+    Returns None (all institutions) only for an admin who asked for no filter.
+    """
+    if current_user.role == UserRole.ADMIN:
+        return institution_code
+
+    if current_user.role != UserRole.COUNSELOR or not current_user.institution_code:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    if institution_code and institution_code != current_user.institution_code:
+        raise HTTPException(status_code=403, detail="Not enough permissions")
+    return current_user.institution_code
+
+def _build_query(resource: ExportResource, institution_code: Optional[str],
+                 start: Optional[datetime], end: Optional[datetime]):
+    spec = EXPORTS[resource]
+    # Plain columns rather than ORM entities: no identity map growth while streaming
+    stmt = select(*spec["columns"])
+
+    if institution_code:
+        if spec["owner"] is not None:
+            stmt = stmt.join(User, User.id == spec["owner"])
+        stmt = stmt.where(User.institution_code == institution_code)
+    if start:
+        stmt = stmt.where(spec["timestamp"] >= start)
+    if end:
+        stmt = stmt.where(spec["timestamp"] < end)
+
+    return stmt.execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+
+async def _stream_batches(stmt, encrypted: List[str]) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield fixed-size row batches from a server-side cursor.
+
+    Uses its own session so the pooled connection is returned as soon as the
+    export finishes or the client disconnects; the format generators close
+    this one explicitly (aclosing) rather than leaving it to the GC.
+    """
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(stmt)
+        async for partition in result.partitions():
+            rows = [dict(row._mapping) for row in partition]
+            for field in encrypted:
+                values = await asyncio.to_thread(
+                    decrypt_sensitive_batch, [row[field] for row in rows]
+                )
+                for row, value in zip(rows, values):
+                    row[field] = value
+            yield rows
+
+def _flatten(value: Any) -> Any:
+    """Reduce a value to a scalar CSV and Parquet can hold"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        return dumps(value).decode()
+    return value
+
+async def _ndjson(batches: AsyncIterator[List[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    async with aclosing(batches):
+        async for rows in batches:
+            yield b"".join(dumps(row) + b"\n" for row in rows)
+
+async def _csv(batches: AsyncIterator[List[Dict[str, Any]]],
+               fieldnames: List[str]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames)
+    writer.writeheader()
+
+    async with aclosing(batches):
+        async for rows in batches:
+            for row in rows:
+                writer.writerow({
+                    key: value.isoformat() if isinstance(value, datetime) else _flatten(value)
+                    for key, value in row.items()
+                })
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back what was written since the last drain"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _arrow_schema(columns):
+    """Fixed Parquet schema from the column types, so no batch has to infer it"""
+    import pyarrow as pa
+
+    def arrow_type(column_type):
+        # Enum, JSON, UUID and text all leave _flatten as strings
+        if isinstance(column_type, sqltypes.Boolean):
+            return pa.bool_()
+        if isinstance(column_type, sqltypes.Integer):
+            return pa.int64()
+        if isinstance(column_type, sqltypes.Numeric):
+            return pa.float64()
+        if isinstance(column_type, sqltypes.DateTime):
+            return pa.timestamp("us", tz="UTC" if column_type.timezone else None)
+        return pa.string()
+
+    return pa.schema([(column.key, arrow_type(column.type)) for column in columns])
+
+async def _parquet(batches: AsyncIterator[List[Dict[str, Any]]],
+                   columns: List[Any]) -> AsyncIterator[bytes]:
+    """One Parquet row group per batch, built through pandas"""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(columns)
+
+    def to_table(rows: List[Dict[str, Any]]):
+        frame = pd.DataFrame.from_records(
+            [{key: _flatten(value) for key, value in row.items()} for row in rows],
+            columns=schema.names
+        )
+        return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    async with aclosing(batches):
+        async for rows in batches:
+            table = await asyncio.to_thread(to_table, rows)
+            await asyncio.to_thread(writer.write_table, table)
+            yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+@router.get("/export/{resource}")
+async def export_data(
+    resource: ExportResource,
+    format: ExportFormat = ExportFormat.NDJSON,
+    institution_code: Optional[str] = None,
+    start: Optional[datetime] = Query(None, description="Inclusive lower bound"),
+    end: Optional[datetime] = Query(None, description="Exclusive upper bound"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Stream a bulk export of users, chat sessions or screening results"""
+
+    institution_code = _resolve_institution(current_user, institution_code)
+
+    # Release the auth lookup's connection; the export streams on its own session
+    await db.close()
+
+    spec = EXPORTS[resource]
+    stmt = _build_query(resource, institution_code, start, end)
+    batches = _stream_batches(stmt, spec["encrypted"])
+
+    if format == ExportFormat.CSV:
+        body = _csv(batches, [column.key for column in spec["columns"]])
+    elif format == ExportFormat.PARQUET:
+        body = _parquet(batches, spec["columns"])
+    else:
+        body = _ndjson(batches)
+
+    filename = f"{resource.value}_{datetime.utcnow():%Y%m%dT%H%M%S}.{format.value}"
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@router.get("/caseload/mood-trends")
+async def get_caseload_mood_trends(
+    institution_code: Optional[str] = None,
+    lookback_days: int = Query(None, ge=1, le=365),
+    alerts_only: bool = False,
+    limit: int = Query(500, ge=1, le=2000),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Mood trend summaries for all active students in an institution"""
+
+    institution_code = _resolve_institution(current_user, institution_code)
+    stmt = select(User.id).where(User.role == UserRole.STUDENT, User.is_active.is_(True))
+    if institution_code:
+        stmt = stmt.where(User.institution_code == institution_code)
+    result = await db.execute(stmt.order_by(User.id).limit(limit).offset(offset))
+    user_ids = list(result.scalars())
+
+    trends = await mood_analytics.get_caseload_trends(db, user_ids, lookback_days)
+    if alerts_only:
+        trends = [trend for trend in trends if trend["deterioration_alert"]]
+
+    return FastJSONResponse({"trends": trends, "count": len(trends)})
+
+@router.get("/users/{user_id}/mood-trend")
+async def get_user_mood_trend(
+    user_id: UUID,
+    resolution: str = Query("day", pattern="^(hour|day)$"),
+    lookback_days: int = Query(None, ge=1, le=365),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Mood trajectory for one student"""
+
+    institution_code = _resolve_institution(current_user, None)
+    user = await db.get(User, user_id)
+    # Admins are unscoped; everyone else must match a non-empty institution
+    out_of_scope = current_user.role != UserRole.ADMIN and (
+        not institution_code or user is None or user.institution_code != institution_code
+    )
+    if not user or out_of_scope:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    trend = await mood_analytics.get_trend(db, user_id, resolution, lookback_days)
+    return FastJSONResponse(trend)
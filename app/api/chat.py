@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
+import hashlib
 import json
 from datetime import datetime
 from app.core.database import get_db
 from app.core.cache import cache
+from app.core.idempotency import idempotency
+from app.core.responses import FastJSONResponse, splice_json
 from app.api.auth import get_current_user
 from app.models.user import User
 from app.models.session import ChatSession
-from app.services.ai_service import ai_service
+from app.services.ai_service import DEFAULT_LANGUAGE, ai_service
+from app.services.analytics import mood_analytics
+from app.services.inference_pool import inference_client
 import asyncio
 
 router = APIRouter()
@@ -25,17 +30,45 @@ class ChatResponse(BaseModel):
     risk_level: str
     crisis_alert: bool
 
-@router.post("/chat", response_model=ChatResponse)
+@router.post("/chat", response_model=ChatResponse, response_class=FastJSONResponse)
 async def chat_with_ai(
     chat_data: ChatMessage,
     background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """Handle AI chat conversation"""
     
+    async def process() -> bytes:
+        return await process_chat_message(chat_data, background_tasks, current_user, db)
+    
+    if not idempotency_key:
+        return FastJSONResponse(await process())
+    
+    # Client retries with the same key replay the first response instead of
+    # re-running analysis, history writes and crisis handling
+    fingerprint = hashlib.sha256(
+        json.dumps([chat_data.message, chat_data.session_id]).encode()
+    ).hexdigest()
+    body = await idempotency.run(
+        f"chat:{current_user.id}:{idempotency_key}", fingerprint, process,
+        # Duplicates don't touch the database; don't hold a pooled connection
+        before_wait=db.close
+    )
+    return FastJSONResponse(body)
+
+async def process_chat_message(
+    chat_data: ChatMessage,
+    background_tasks: BackgroundTasks,
+    current_user: User,
+    db: AsyncSession
+) -> bytes:
+    """Run analysis and persist the turn; returns the encoded ChatResponse"""
+    
     # Analyze message with AI service
-    analysis = await ai_service.analyze_message(chat_data.message)
+    language = current_user.preferred_language or DEFAULT_LANGUAGE
+    analysis = await inference_client.analyze_message(chat_data.message, language)
     
     # Get or create chat session
     session = None
@@ -65,6 +98,9 @@ async def chat_with_ai(
     session.conversation_history.append(conversation_entry)
     session.mood_scores.append(analysis["mood_score"])
     session.message_count += 1
+    await mood_analytics.record_mood(
+        db, current_user.id, session.id, analysis["mood_score"], analysis["risk_level"]
+    )
     
     # Handle crisis situation
     crisis_alert = analysis["risk_level"] in ["high", "critical"]
@@ -89,12 +125,18 @@ async def chat_with_ai(
         "risk_level": analysis["risk_level"]
     })
     
-    return ChatResponse(
-        response=analysis["recommended_response"],
-        session_id=str(session.id),
-        mood_score=analysis["mood_score"],
-        risk_level=analysis["risk_level"],
-        crisis_alert=crisis_alert
+    # Fields below are produced internally, so skip response_model validation;
+    # the reply is the same text stored in conversation_history
+    return splice_json(
+        {"response": ai_service.encode_response(
+            analysis["recommended_response"], analysis["risk_level"], language
+        )},
+        {
+            "session_id": str(session.id),
+            "mood_score": analysis["mood_score"],
+            "risk_level": analysis["risk_level"],
+            "crisis_alert": crisis_alert
+        }
     )
 
 async def handle_crisis_response(user_id: str, analysis: dict):
@@ -106,7 +148,7 @@ async def handle_crisis_response(user_id: str, analysis: dict):
     # 4. Potentially contact emergency services
     pass
 
-@router.get("/chat/history/{session_id}")
+@router.get("/chat/history/{session_id}", response_class=FastJSONResponse)
 async def get_chat_history(
     session_id: str,
     current_user: User = Depends(get_current_user),
@@ -116,16 +158,17 @@ async def get_chat_history(
     
     # Check cache first
     cache_key = f"chat_session:{session_id}"
-    cached_data = await cache.get(cache_key)
+    cached_data = await cache.get_raw(cache_key)
     if cached_data:
-        return cached_data
+        # Already JSON; send it without decoding and re-encoding
+        return FastJSONResponse(cached_data.encode())
     
     # Fetch from database
     session = await db.get(ChatSession, session_id)
     if not session or session.user_id != current_user.id:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return {
+    return FastJSONResponse({
         "conversation_history": session.conversation_history,
         "mood_scores": session.mood_scores,
         "session_stats": {
@@ -133,4 +176,4 @@ async def get_chat_history(
             "message_count": session.message_count,
             "average_mood": sum(session.mood_scores) / len(session.mood_scores) if session.mood_scores else 0
         }
-    }
+    })
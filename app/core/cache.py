@@ -4,6 +4,13 @@ from typing import Any, Optional
 import pickle
 import asyncio
 
+COMPARE_AND_DELETE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
 class CacheManager:
     def __init__(self):
         self.redis_client = None
@@ -26,6 +33,16 @@ class CacheManager:
         except Exception:
             return None
     
+    async def get_raw(self, key: str) -> Optional[str]:
+        """Return the stored JSON string without decoding it"""
+        try:
+            if not self.redis_client:
+                await self.init_redis()
+            
+            return await self.redis_client.get(key)
+        except Exception:
+            return None
+    
     async def set(self, key: str, value: Any, expire: int = None):
         try:
             if not self.redis_client:
@@ -40,6 +57,24 @@ class CacheManager:
         except Exception:
             pass  # Fail silently for cache operations
     
+    async def set_nx(self, key: str, value: str, expire: int) -> bool:
+        """Set key only if absent. Fails open (True) when Redis is unavailable."""
+        try:
+            if not self.redis_client:
+                await self.init_redis()
+            return bool(await self.redis_client.set(key, value, nx=True, ex=expire))
+        except Exception:
+            return True
+    
+    async def delete_if_equals(self, key: str, value: str):
+        """Delete key only while it still holds value (atomic compare-and-delete)"""
+        try:
+            if not self.redis_client:
+                await self.init_redis()
+            await self.redis_client.eval(COMPARE_AND_DELETE, 1, key, value)
+        except Exception:
+            pass
+    
     async def delete(self, key: str):
         try:
             if not self.redis_client:
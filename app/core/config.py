@@ -19,6 +19,10 @@ class Settings(BaseSettings):
     REDIS_URL: str = "redis://localhost:6379/0"
     CACHE_EXPIRE_SECONDS: int = 3600
     
+    # Idempotent Chat Submissions
+    IDEMPOTENCY_TTL_SECONDS: int = 60 * 60 * 24  # Completed responses replayed for 1 day
+    IDEMPOTENCY_LOCK_SECONDS: int = 30  # Upper bound on one in-flight execution
+    
     # Security
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "https://yourdomain.com"]
     ENCRYPTION_KEY: str = secrets.token_urlsafe(32)
@@ -27,6 +31,22 @@ class Settings(BaseSettings):
     HUGGINGFACE_API_KEY: Optional[str] = None
     AI_MODEL_PATH: str = "./models/mental_health_classifier"
     
+    # AI Inference Worker Pool
+    AI_WORKER_MODE: bool = False  # Route analysis to the dedicated inference pool
+    AI_WORKER_SOCKET: str = "/tmp/mindwell_inference.sock"
+    AI_WORKER_PROCESSES: int = 2
+    AI_REQUEST_TIMEOUT_SECONDS: float = 5.0
+    AI_MAX_IN_FLIGHT: int = 64  # Requests over this are refused, clients fall back
+    
+    # Admin Exports
+    EXPORT_BATCH_SIZE: int = 1000  # Rows fetched from the server-side cursor per batch
+    
+    # Mood Trends
+    MOOD_TREND_LOOKBACK_DAYS: int = 30
+    MOOD_TREND_WINDOW_DAYS: int = 7  # Moving average / recent average window
+    MOOD_ALERT_SLOPE_PER_DAY: float = -0.15  # Mood falling faster than this alerts
+    MOOD_ALERT_LEVEL: float = 3.0  # Recent average at or below this alerts
+    
     # Monitoring
     SENTRY_DSN: Optional[str] = None
     LOG_LEVEL: str = "INFO"
@@ -0,0 +1,120 @@
+from fastapi import HTTPException
+from typing import Awaitable, Callable, Dict, Optional
+import asyncio
+import secrets
+import time
+from app.core.cache import cache
+from app.core.config import settings
+
+POLL_INTERVAL_SECONDS = 0.05
+LOCK_MARGIN_SECONDS = 5
+
+def _incomplete() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="A request with this Idempotency-Key did not complete, please retry"
+    )
+
+class IdempotencyManager:
+    """Run a request once per idempotency key and replay the stored response.
+
+    Duplicates in the same process await the running execution directly;
+    duplicates in other API workers poll Redis until the result is stored.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def _replay(record: Dict, fingerprint: str) -> bytes:
+        if record["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        return record["body"].encode()
+
+    async def _wait_for_result(self, result_key: str, lock_key: str) -> Dict:
+        """Wait for another worker's execution of the same key to finish"""
+        deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_SECONDS + LOCK_MARGIN_SECONDS
+        while time.monotonic() < deadline:
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+            record = await cache.get(result_key)
+            if record:
+                return record
+            if not await cache.get_raw(lock_key):
+                break  # First execution failed without storing a result
+
+        raise _incomplete()
+
+    async def run(self, key: str, fingerprint: str,
+                  handler: Callable[[], Awaitable[bytes]],
+                  before_wait: Optional[Callable[[], Awaitable[None]]] = None) -> bytes:
+        """Return the response body for key, executing handler at most once.
+
+        before_wait runs before a duplicate starts waiting, e.g. to return
+        its database connection to the pool.
+        """
+        future = self._in_flight.get(key)
+        if future:
+            if before_wait:
+                await before_wait()
+            try:
+                record = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise  # This request was cancelled, not the first one
+                raise _incomplete()
+            except Exception:
+                # Same answer a duplicate in another worker would get
+                raise _incomplete()
+            return self._replay(record, fingerprint)
+
+        # Claim the key before the first await so concurrent duplicates in
+        # this process always find the future above
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+
+        result_key = f"idempotency:{key}:result"
+        lock_key = f"idempotency:{key}:lock"
+        token = secrets.token_hex(16)
+        owns_lock = False
+        try:
+            record = await cache.get(result_key)
+            if not record:
+                # The lock outlives the handler's time limit, so it can't expire
+                # and let another worker start while this run is still going
+                owns_lock = await cache.set_nx(
+                    lock_key, token, settings.IDEMPOTENCY_LOCK_SECONDS + LOCK_MARGIN_SECONDS
+                )
+                if owns_lock:
+                    try:
+                        body = await asyncio.wait_for(
+                            handler(), settings.IDEMPOTENCY_LOCK_SECONDS
+                        )
+                    except asyncio.TimeoutError:
+                        raise HTTPException(status_code=504, detail="Request timed out")
+                    record = {"fingerprint": fingerprint, "body": body.decode()}
+                    await cache.set(result_key, record, expire=settings.IDEMPOTENCY_TTL_SECONDS)
+                else:
+                    if before_wait:
+                        await before_wait()
+                    record = await self._wait_for_result(result_key, lock_key)
+            future.set_result(record)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()  # Mark retrieved when nobody else is waiting
+            raise
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+            if owns_lock:
+                # Never release a lock another worker took over
+                await cache.delete_if_equals(lock_key, token)
+
+        return self._replay(record, fingerprint)
+
+idempotency = IdempotencyManager()
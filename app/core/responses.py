@@ -0,0 +1,37 @@
+from typing import Any, Dict
+from fastapi.responses import Response
+from pydantic import BaseModel
+import orjson
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+def _default(obj: Any) -> Any:
+    # Trusted internal models: dump field values as-is, no re-validation
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    raise TypeError(f"Type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+class FastJSONResponse(Response):
+    """orjson-backed response for trusted payloads.
+
+    Return an instance directly from a route to bypass FastAPI's response_model
+    validation and jsonable_encoder. Pre-encoded ``bytes`` are sent verbatim.
+    """
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+def splice_json(prefix: Dict[str, bytes], content: Dict[str, Any]) -> bytes:
+    """Build a JSON object from already-encoded values plus regular fields"""
+    if not prefix:
+        return dumps(content)
+    head = b",".join(dumps(key) + b":" + value for key, value in prefix.items())
+    if not content:
+        return b"{" + head + b"}"
+    return b"{" + head + b"," + dumps(content)[1:]
@@ -1,14 +1,15 @@
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, List, Union, Optional
 from jose import jwt
 from passlib.context import CryptContext
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 import hashlib
 import secrets
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # Encryption for sensitive data
+FERNET_TOKEN_PREFIX = "gAAAAA"  # Version byte 0x80 plus timestamp, base64url
 cipher_suite = Fernet(settings.ENCRYPTION_KEY.encode()[:44] + b'=')
 
 def create_access_token(
@@ -41,6 +42,23 @@ def decrypt_sensitive_data(encrypted_data: str) -> str:
     """Decrypt sensitive user data"""
     return cipher_suite.decrypt(encrypted_data.encode()).decode()
 
+def decrypt_sensitive_batch(values: List[Optional[str]]) -> List[Optional[str]]:
+    """Decrypt a batch of values; rows stored before encryption pass through.
+
+    A value that is a Fernet token but fails to decrypt means a wrong or
+    rotated ENCRYPTION_KEY, so it raises instead of shipping ciphertext.
+    """
+    decrypted = []
+    for value in values:
+        if not value or not value.startswith(FERNET_TOKEN_PREFIX):
+            decrypted.append(value)
+            continue
+        try:
+            decrypted.append(decrypt_sensitive_data(value))
+        except InvalidToken:
+            raise ValueError("Cannot decrypt sensitive data; check ENCRYPTION_KEY")
+    return decrypted
+
 def generate_anonymous_id() -> str:
     """Generate secure anonymous user ID"""
     return hashlib.sha256(secrets.token_bytes(32)).hexdigest()
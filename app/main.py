@@ -8,6 +8,7 @@ import asyncio
 import structlog
 from prometheus_client import Counter, Histogram, generate_latest
 import uvicorn
+from app.services.inference_pool import inference_client
 
 # Metrics
 REQUEST_COUNT = Counter('http_requests_total', 'Total HTTP requests', ['method', 'endpoint', 'status'])
@@ -49,6 +50,7 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down Mental Health Support System API")
+    await inference_client.close()
 
 # Create FastAPI app
 app = FastAPI(
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, BigInteger, Integer, SmallInteger, String, DateTime, Float, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+class MoodPoint(Base):
+    """Append-only mood observation, one per analyzed chat message"""
+    __tablename__ = "mood_points"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id"), nullable=True)
+
+    mood_score = Column(Float, nullable=False)  # 1-10 scale
+    risk_rank = Column(SmallInteger, nullable=False)  # 0=low ... 3=critical
+
+    recorded_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (
+        # Rows arrive in time order, so a BRIN index stays tiny for range scans
+        Index("ix_mood_points_recorded_at_brin", "recorded_at", postgresql_using="brin"),
+        Index("ix_mood_points_user_recorded", "user_id", "recorded_at"),
+    )
+
+class MoodRollup(Base):
+    """Hourly/daily mood aggregates, maintained on every MoodPoint insert"""
+    __tablename__ = "mood_rollups"
+
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    resolution = Column(String(8), primary_key=True)  # hour, day
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Float, nullable=False, default=0.0)  # Sum of mood scores
+    min_score = Column(Float, nullable=False)
+    max_score = Column(Float, nullable=False)
+    peak_risk_rank = Column(SmallInteger, nullable=False, default=0)
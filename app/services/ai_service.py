@@ -6,9 +6,37 @@ from sklearn.naive_bayes import MultinomialNB
 import pickle
 import re
 import json
+from app.core.config import settings
+from app.core.responses import dumps
+
+DEFAULT_LANGUAGE = "en"
+
+# Static replies keyed by User.preferred_language, then risk level
+RESPONSE_TEMPLATES: Dict[str, Dict[str, str]] = {
+    "en": {
+        "critical": ("I'm very concerned about what you've shared. Your safety is important. "
+                     "Please reach out to a counselor immediately or contact emergency services. "
+                     "Would you like me to connect you with immediate help?"),
+        "high": ("Thank you for sharing this with me. It sounds like you're going through "
+                 "a difficult time. I'd like to connect you with a professional counselor "
+                 "who can provide proper support. In the meantime, here are some immediate "
+                 "coping strategies..."),
+        "moderate": ("I understand you're facing some challenges. Many students experience "
+                     "similar feelings. Let's explore some coping strategies and resources "
+                     "that might help..."),
+        "low": ("Thank you for reaching out. How are you feeling today? "
+                "I'm here to listen and provide support."),
+    },
+}
+
+# Encoded once at import so /chat can splice them into the response body
+ENCODED_RESPONSE_TEMPLATES: Dict[str, Dict[str, bytes]] = {
+    language: {risk_level: dumps(text) for risk_level, text in templates.items()}
+    for language, templates in RESPONSE_TEMPLATES.items()
+}
 
 class MentalHealthAI:
-    def __init__(self):
+    def __init__(self, load_model: bool = True):
         self.crisis_keywords = [
             "suicide", "kill myself", "end it all", "no point", "hopeless",
             "hurt myself", "self harm", "cutting", "overdose", "jump"
@@ -23,7 +51,8 @@ class MentalHealthAI:
         # Load pre-trained model (if available)
         self.classifier = None
         self.vectorizer = None
-        self._load_model()
+        if load_model:
+            self._load_model()
     
     def _load_model(self):
         """Load pre-trained AI model for mental health classification"""
@@ -36,13 +65,13 @@ class MentalHealthAI:
             # Use rule-based system if no trained model available
             pass
     
-    async def analyze_message(self, message: str) -> Dict:
+    async def analyze_message(self, message: str, language: str = DEFAULT_LANGUAGE) -> Dict:
         """Analyze user message for mental health indicators"""
         analysis = {
             "sentiment": await self._analyze_sentiment(message),
             "risk_level": await self._assess_risk_level(message),
             "crisis_indicators": await self._detect_crisis(message),
-            "recommended_response": await self._generate_response(message),
+            "recommended_response": await self._generate_response(message, language),
             "mood_score": await self._calculate_mood_score(message)
         }
         return analysis
@@ -90,29 +119,20 @@ class MentalHealthAI:
         
         return indicators
     
-    async def _generate_response(self, message: str) -> str:
+    async def _generate_response(self, message: str, language: str = DEFAULT_LANGUAGE) -> str:
         """Generate appropriate AI response"""
         risk_level = await self._assess_risk_level(message)
-        
-        if risk_level == "critical":
-            return ("I'm very concerned about what you've shared. Your safety is important. "
-                   "Please reach out to a counselor immediately or contact emergency services. "
-                   "Would you like me to connect you with immediate help?")
-        
-        elif risk_level == "high":
-            return ("Thank you for sharing this with me. It sounds like you're going through "
-                   "a difficult time. I'd like to connect you with a professional counselor "
-                   "who can provide proper support. In the meantime, here are some immediate "
-                   "coping strategies...")
-        
-        elif risk_level == "moderate":
-            return ("I understand you're facing some challenges. Many students experience "
-                   "similar feelings. Let's explore some coping strategies and resources "
-                   "that might help...")
-        
-        else:
-            return ("Thank you for reaching out. How are you feeling today? "
-                   "I'm here to listen and provide support.")
+        templates = RESPONSE_TEMPLATES.get(language, RESPONSE_TEMPLATES[DEFAULT_LANGUAGE])
+        return templates[risk_level]
+    
+    def encode_response(self, response: str, risk_level: str,
+                        language: str = DEFAULT_LANGUAGE) -> bytes:
+        """JSON-encode a reply, reusing the pre-encoded template when it is one"""
+        if language not in RESPONSE_TEMPLATES:
+            language = DEFAULT_LANGUAGE
+        if RESPONSE_TEMPLATES[language].get(risk_level) == response:
+            return ENCODED_RESPONSE_TEMPLATES[language][risk_level]
+        return dumps(response)
     
     async def _calculate_mood_score(self, message: str) -> float:
         """Calculate mood score from 1-10"""
@@ -135,4 +155,5 @@ class MentalHealthAI:
         
         return max(1.0, min(10.0, base_score))
 
-ai_service = MentalHealthAI()
+# In worker mode the model lives in the inference pool, not in every API worker
+ai_service = MentalHealthAI(load_model=not settings.AI_WORKER_MODE)
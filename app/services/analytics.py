@@ -0,0 +1,300 @@
+from datetime import datetime, timedelta, timezone
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.mood import MoodPoint, MoodRollup
+from app.models.session import ChatSession
+
+RISK_RANK = {"low": 0, "moderate": 1, "high": 2, "critical": 3}
+RISK_LEVELS = {rank: level for level, rank in RISK_RANK.items()}
+
+RESOLUTIONS = {
+    "hour": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    "day": lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+class MoodAnalytics:
+    """Per-user mood time series: raw points, rollups and trend computation"""
+
+    async def record_mood(self, db: AsyncSession, user_id: UUID, session_id: Optional[UUID],
+                          mood_score: float, risk_level: str):
+        """Append a mood point and fold it into the hourly and daily rollups.
+
+        Runs in the caller's transaction; the caller commits.
+        """
+        now = datetime.now(timezone.utc)
+        await self._store_points(
+            db, user_id, session_id, [(now, mood_score, RISK_RANK.get(risk_level, 0))]
+        )
+
+    async def _store_points(self, db: AsyncSession, user_id: UUID, session_id: Optional[UUID],
+                            points: List[Tuple[datetime, float, int]]):
+        """Insert (recorded_at, mood_score, risk_rank) points and upsert their rollups"""
+        db.add_all([
+            MoodPoint(
+                user_id=user_id,
+                session_id=session_id,
+                mood_score=mood_score,
+                risk_rank=risk_rank,
+                recorded_at=recorded_at
+            )
+            for recorded_at, mood_score, risk_rank in points
+        ])
+
+        # Pre-aggregate per bucket so each rollup row is upserted once
+        buckets: Dict[Tuple[str, datetime], Dict] = {}
+        for recorded_at, mood_score, risk_rank in points:
+            for resolution, truncate in RESOLUTIONS.items():
+                bucket_start = truncate(recorded_at)
+                bucket = buckets.get((resolution, bucket_start))
+                if bucket is None:
+                    buckets[(resolution, bucket_start)] = {
+                        "user_id": user_id,
+                        "resolution": resolution,
+                        "bucket_start": bucket_start,
+                        "count": 1,
+                        "total": mood_score,
+                        "min_score": mood_score,
+                        "max_score": mood_score,
+                        "peak_risk_rank": risk_rank,
+                    }
+                else:
+                    bucket["count"] += 1
+                    bucket["total"] += mood_score
+                    bucket["min_score"] = min(bucket["min_score"], mood_score)
+                    bucket["max_score"] = max(bucket["max_score"], mood_score)
+                    bucket["peak_risk_rank"] = max(bucket["peak_risk_rank"], risk_rank)
+
+        stmt = insert(MoodRollup).values(list(buckets.values()))
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[MoodRollup.user_id, MoodRollup.resolution, MoodRollup.bucket_start],
+            set_={
+                "count": MoodRollup.count + stmt.excluded.count,
+                "total": MoodRollup.total + stmt.excluded.total,
+                "min_score": func.least(MoodRollup.min_score, stmt.excluded.min_score),
+                "max_score": func.greatest(MoodRollup.max_score, stmt.excluded.max_score),
+                "peak_risk_rank": func.greatest(
+                    MoodRollup.peak_risk_rank, stmt.excluded.peak_risk_rank
+                ),
+            }
+        ))
+
+    async def backfill_from_sessions(self, before: Optional[datetime] = None,
+                                     batch_size: int = 500) -> int:
+        """One-off replay of ChatSession.conversation_history into the store.
+
+        Only turns older than `before` are replayed; it defaults to the first
+        live MoodPoint, i.e. when /chat started recording. Sessions that
+        already have points older than that were backfilled before and are
+        skipped, so the backfill can be re-run safely. Returns points written.
+        """
+        written = 0
+        async with AsyncSessionLocal() as read_db, AsyncSessionLocal() as write_db:
+            if before is None:
+                before = (await write_db.scalar(select(func.min(MoodPoint.recorded_at)))
+                          or datetime.now(timezone.utc))
+
+            result = await read_db.stream(
+                select(ChatSession.id, ChatSession.user_id,
+                       ChatSession.conversation_history, ChatSession.started_at)
+                .where(ChatSession.started_at < before)
+                .execution_options(yield_per=batch_size)
+            )
+            async for partition in result.partitions():
+                done = set(await write_db.scalars(
+                    select(MoodPoint.session_id).distinct().where(
+                        MoodPoint.session_id.in_([row.id for row in partition]),
+                        MoodPoint.recorded_at < before
+                    )
+                ))
+                for row in partition:
+                    if row.id in done:
+                        continue
+                    points = _history_points(row.conversation_history, row.started_at, before)
+                    if points:
+                        await self._store_points(write_db, row.user_id, row.id, points)
+                        written += len(points)
+                await write_db.commit()
+        return written
+
+    async def _fetch_rollups(self, db: AsyncSession, user_ids: List[UUID],
+                             resolution: str, since: datetime):
+        result = await db.execute(
+            select(
+                MoodRollup.user_id,
+                MoodRollup.bucket_start,
+                MoodRollup.count,
+                MoodRollup.total,
+                MoodRollup.peak_risk_rank
+            )
+            .where(
+                MoodRollup.user_id.in_(user_ids),
+                MoodRollup.resolution == resolution,
+                MoodRollup.bucket_start >= since
+            )
+            .order_by(MoodRollup.user_id, MoodRollup.bucket_start)
+        )
+        return result.all()
+
+    async def get_trend(self, db: AsyncSession, user_id: UUID, resolution: str = "day",
+                        lookback_days: int = None) -> Dict:
+        """Mood series with moving average, slope and deterioration alert for one user"""
+        lookback_days = lookback_days or settings.MOOD_TREND_LOOKBACK_DAYS
+        now = datetime.now(timezone.utc)
+        rows = await self._fetch_rollups(
+            db, [user_id], resolution, now - timedelta(days=lookback_days)
+        )
+
+        buckets = [row.bucket_start for row in rows]
+        counts = np.array([row.count for row in rows], dtype=np.float64)
+        means = np.array([row.total for row in rows], dtype=np.float64) / np.maximum(counts, 1)
+        days = np.array([(b - now).total_seconds() / 86400 for b in buckets], dtype=np.float64)
+        peak_risk = max((row.peak_risk_rank for row in rows), default=0)
+
+        window = settings.MOOD_TREND_WINDOW_DAYS
+        moving_average = _moving_average(days, means, counts, window)
+        slope = _slope(days, means)
+
+        # Same trailing calendar window as get_caseload_trends
+        recent = days >= -window
+        recent_average = (float(np.sum(means[recent] * counts[recent]) / np.sum(counts[recent]))
+                          if recent.any() else None)
+
+        return {
+            "user_id": str(user_id),
+            "resolution": resolution,
+            "series": [
+                {"bucket_start": bucket.isoformat(), "average": float(mean), "count": int(count)}
+                for bucket, mean, count in zip(buckets, means, counts)
+            ],
+            "moving_average": moving_average.tolist(),
+            "slope_per_day": slope,
+            "recent_average": recent_average,
+            "peak_risk_level": RISK_LEVELS[peak_risk],
+            # None, not False: no stored data is not evidence of no deterioration
+            "has_data": bool(rows),
+            "deterioration_alert": (_is_deteriorating(slope, recent_average, peak_risk)
+                                    if rows else None),
+        }
+
+    async def get_caseload_trends(self, db: AsyncSession, user_ids: List[UUID],
+                                  lookback_days: int = None) -> List[Dict]:
+        """Summary trend for many users from one daily-rollup query.
+
+        Per-user sums are accumulated with np.bincount, so the cost is a
+        single pass over the rows regardless of caseload size.
+        """
+        if not user_ids:
+            return []
+        lookback_days = lookback_days or settings.MOOD_TREND_LOOKBACK_DAYS
+        now = datetime.now(timezone.utc)
+        rows = await self._fetch_rollups(
+            db, user_ids, "day", now - timedelta(days=lookback_days)
+        )
+
+        position = {user_id: i for i, user_id in enumerate(user_ids)}
+        n = len(user_ids)
+        group = np.array([position[row.user_id] for row in rows], dtype=np.int64)
+        counts = np.array([row.count for row in rows], dtype=np.float64)
+        totals = np.array([row.total for row in rows], dtype=np.float64)
+        risks = np.array([row.peak_risk_rank for row in rows], dtype=np.int64)
+        x = np.array([(row.bucket_start - now).total_seconds() / 86400 for row in rows],
+                     dtype=np.float64)
+        y = totals / np.maximum(counts, 1)
+
+        # Least-squares slope of daily means per user, from grouped sums
+        k = np.bincount(group, minlength=n).astype(np.float64)
+        sx = np.bincount(group, x, minlength=n)
+        sy = np.bincount(group, y, minlength=n)
+        sxx = np.bincount(group, x * x, minlength=n)
+        sxy = np.bincount(group, x * y, minlength=n)
+        denominator = k * sxx - sx * sx
+        with np.errstate(divide="ignore", invalid="ignore"):
+            slopes = np.where(
+                (k >= 2) & (denominator > 0), (k * sxy - sx * sy) / denominator, np.nan
+            )
+
+        # Count-weighted average over the trailing window
+        recent = x >= -settings.MOOD_TREND_WINDOW_DAYS
+        recent_counts = np.bincount(group[recent], counts[recent], minlength=n)
+        recent_totals = np.bincount(group[recent], totals[recent], minlength=n)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            recent_averages = np.where(recent_counts > 0, recent_totals / recent_counts, np.nan)
+
+        peak_risks = np.zeros(n, dtype=np.int64)
+        np.maximum.at(peak_risks, group, risks)
+
+        trends = []
+        for i, user_id in enumerate(user_ids):
+            slope = None if np.isnan(slopes[i]) else float(slopes[i])
+            recent_average = None if np.isnan(recent_averages[i]) else float(recent_averages[i])
+            trends.append({
+                "user_id": str(user_id),
+                "data_points": int(k[i]),
+                "slope_per_day": slope,
+                "recent_average": recent_average,
+                "peak_risk_level": RISK_LEVELS[int(peak_risks[i])],
+                "has_data": bool(k[i]),
+                "deterioration_alert": (
+                    _is_deteriorating(slope, recent_average, int(peak_risks[i])) if k[i] else None
+                ),
+            })
+        return trends
+
+def _history_points(history: Optional[List[Dict]], started_at: datetime,
+                    before: datetime) -> List[Tuple[datetime, float, int]]:
+    """Mood points from a session's conversation_history entries"""
+    points = []
+    for entry in history or []:
+        if entry.get("mood_score") is None:
+            continue
+        recorded_at = started_at
+        if entry.get("timestamp"):
+            recorded_at = datetime.fromisoformat(entry["timestamp"])
+            if recorded_at.tzinfo is None:
+                recorded_at = recorded_at.replace(tzinfo=timezone.utc)  # Stored as utcnow()
+        if recorded_at >= before:
+            continue
+        points.append((
+            recorded_at, float(entry["mood_score"]), RISK_RANK.get(entry.get("risk_level"), 0)
+        ))
+    return points
+
+def _moving_average(days: np.ndarray, means: np.ndarray, counts: np.ndarray,
+                    window: float) -> np.ndarray:
+    """Count-weighted average over the trailing `window` days at each bucket"""
+    if not len(means):
+        return means
+    weighted = np.cumsum(means * counts)
+    weights = np.cumsum(counts)
+    # First bucket inside each window; days is sorted ascending
+    start = np.searchsorted(days, days - window, side="left")
+    weighted = weighted - np.where(start > 0, weighted[start - 1], 0.0)
+    weights = weights - np.where(start > 0, weights[start - 1], 0.0)
+    return weighted / np.maximum(weights, 1)
+
+def _slope(days: np.ndarray, means: np.ndarray) -> Optional[float]:
+    if len(means) < 2 or np.ptp(days) == 0:
+        return None
+    return float(np.polyfit(days, means, 1)[0])
+
+def _is_deteriorating(slope: Optional[float], recent_average: Optional[float],
+                      peak_risk: int) -> bool:
+    if peak_risk >= RISK_RANK["high"]:
+        return True
+    if slope is not None and slope <= settings.MOOD_ALERT_SLOPE_PER_DAY:
+        return True
+    return recent_average is not None and recent_average <= settings.MOOD_ALERT_LEVEL
+
+mood_analytics = MoodAnalytics()
+
+if __name__ == "__main__":
+    # python -m app.services.analytics  (one-off backfill of historic sessions)
+    written = asyncio.run(mood_analytics.backfill_from_sessions())
+    print(f"Backfilled {written} mood points")
@@ -0,0 +1,282 @@
+import asyncio
+import gc
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Tuple
+import structlog
+from app.core.config import settings
+from app.services.ai_service import DEFAULT_LANGUAGE, MentalHealthAI, ai_service
+
+logger = structlog.get_logger()
+
+# Line-delimited JSON over a Unix socket; bodies can hold long messages
+STREAM_LIMIT = 2 ** 20
+
+# Non-zero exit so a supervisor restarts the pool and re-forks the workers
+EXIT_POOL_BROKEN = 1
+
+# Model instance inherited by forked workers (copy-on-write)
+_worker_ai: Optional[MentalHealthAI] = None
+
+def _run_analysis(message: str, language: str) -> Dict:
+    """Executed inside a pool worker"""
+    return asyncio.run(_worker_ai.analyze_message(message, language))
+
+def _parse_request(line: bytes) -> Optional[Dict]:
+    """Decode one request line; None if it is not a well-formed request"""
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return None
+    if (isinstance(request, dict)
+            and isinstance(request.get("id"), int)
+            and isinstance(request.get("message"), str)
+            and isinstance(request.get("language"), str)
+            and isinstance(request.get("deadline"), (int, float))):
+        return request
+    return None
+
+class InferenceServer:
+    """Dedicated inference process: loads the model once and serves API workers"""
+
+    def __init__(self, socket_path: str = None, processes: int = None,
+                 max_in_flight: int = None):
+        self.socket_path = socket_path or settings.AI_WORKER_SOCKET
+        self.processes = processes or settings.AI_WORKER_PROCESSES
+        self.max_in_flight = max_in_flight or settings.AI_MAX_IN_FLIGHT
+        self.executor = None
+        self._workers: asyncio.Semaphore = None
+        self._in_flight = 0
+        self.exit_code = 0
+        self._stopped: asyncio.Event = None
+
+    def start_workers(self):
+        """Load the model in the parent, then fork workers that share its pages.
+
+        Must run before the event loop starts so children don't inherit it.
+        """
+        global _worker_ai
+        _worker_ai = MentalHealthAI(load_model=True)
+
+        # Move loaded objects out of the GC's reach so collections in the
+        # children don't touch their headers and break copy-on-write sharing
+        gc.collect()
+        gc.freeze()
+
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("fork")
+        )
+        # The fork context starts every worker on first submit; do it now
+        self.executor.submit(os.getpid).result()
+
+    async def _run(self, request: Dict) -> Dict:
+        # Requests queue here rather than inside the executor, so one whose
+        # client has already given up can be dropped before it uses a worker
+        async with self._workers:
+            if time.time() >= request["deadline"]:
+                raise TimeoutError("Deadline exceeded")
+            # One message per submit so concurrent requests spread across workers
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, _run_analysis, request["message"], request["language"]
+            )
+
+    async def _handle_request(self, request: Dict, writer: asyncio.StreamWriter):
+        try:
+            analysis = await self._run(request)
+            reply = {"id": request["id"], "analysis": analysis}
+        except TimeoutError:
+            reply = {"id": request["id"], "error": "Deadline exceeded"}
+        except BrokenProcessPool as exc:
+            # A worker died (e.g. OOM kill); the executor can't be rebuilt
+            # without forking this process mid-loop, so exit and let the
+            # supervisor restart from a clean parent
+            logger.critical("Inference worker died, shutting down pool", error=str(exc))
+            reply = {"id": request["id"], "error": "Inference pool unavailable"}
+            self.exit_code = EXIT_POOL_BROKEN
+            self._stopped.set()
+        except Exception as exc:
+            logger.error("Inference request failed", error=str(exc))
+            reply = {"id": request["id"], "error": str(exc)}
+
+        if not writer.is_closing():
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+
+    @staticmethod
+    def _reject(line: bytes, writer: asyncio.StreamWriter):
+        """Answer one malformed request without dropping the connection"""
+        try:
+            request_id = json.loads(line).get("id")
+        except (ValueError, AttributeError):
+            request_id = None
+        logger.warning("Rejected malformed inference request", id=request_id)
+        if request_id is not None and not writer.is_closing():
+            writer.write(
+                json.dumps({"id": request_id, "error": "Malformed request"}).encode() + b"\n"
+            )
+
+    async def _handle_client(self, reader: asyncio.StreamReader,
+                             writer: asyncio.StreamWriter):
+        """Serve one API worker connection; requests are multiplexed by id"""
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                request = _parse_request(line)
+                if request is None:
+                    self._reject(line, writer)
+                    continue
+                task = self._admit(request, writer)
+                if task:
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        except (ConnectionError, ValueError) as exc:
+            logger.warning("Inference client disconnected", error=str(exc))
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+
+    def _admit(self, request: Dict, writer: asyncio.StreamWriter) -> Optional[asyncio.Task]:
+        """Start a request, or refuse it at once when the server is at capacity"""
+        if self._in_flight >= self.max_in_flight:
+            writer.write(
+                json.dumps({"id": request["id"], "error": "Overloaded"}).encode() + b"\n"
+            )
+            return None
+
+        self._in_flight += 1
+        task = asyncio.create_task(self._handle_request(request, writer))
+        task.add_done_callback(self._release)
+        return task
+
+    def _release(self, task: asyncio.Task):
+        self._in_flight -= 1
+
+    async def serve(self) -> int:
+        """Serve until the worker pool breaks; returns the process exit code"""
+        self._stopped = asyncio.Event()
+        self._workers = asyncio.Semaphore(self.processes)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(
+            self._handle_client, path=self.socket_path, limit=STREAM_LIMIT
+        )
+        logger.info(
+            "Inference pool ready",
+            socket=self.socket_path,
+            processes=self.processes
+        )
+
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+        return self.exit_code
+
+class InferenceClient:
+    """API-worker side of the inference pool, with in-process fallback"""
+
+    def __init__(self, socket_path: str = None, timeout: float = None):
+        self.socket_path = socket_path or settings.AI_WORKER_SOCKET
+        self.timeout = timeout or settings.AI_REQUEST_TIMEOUT_SECONDS
+        self._writer = None
+        self._reader_task = None
+        # Futures awaiting a reply on the current connection only
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._connect_lock = asyncio.Lock()
+
+    async def _connect(self) -> Tuple[asyncio.StreamWriter, Dict[int, asyncio.Future]]:
+        async with self._connect_lock:
+            if not self._writer or self._writer.is_closing():
+                reader, writer = await asyncio.open_unix_connection(
+                    self.socket_path, limit=STREAM_LIMIT
+                )
+                self._writer, self._pending = writer, {}
+                self._reader_task = asyncio.create_task(
+                    self._read_replies(reader, writer, self._pending)
+                )
+            return self._writer, self._pending
+
+    async def _read_replies(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                            pending: Dict[int, asyncio.Future]):
+        """Resolve replies for one connection; a reconnect gets its own reader task"""
+        try:
+            while line := await reader.readline():
+                reply = json.loads(line)
+                future = pending.get(reply["id"])
+                if not future or future.done():
+                    continue
+                if "error" in reply:
+                    future.set_exception(RuntimeError(reply["error"]))
+                else:
+                    future.set_result(reply["analysis"])
+        except (ConnectionError, ValueError, KeyError):
+            pass
+        finally:
+            # Fail what is still waiting on this connection so callers fall back
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Inference pool disconnected"))
+            writer.close()
+
+    async def _request(self, message: str, language: str, deadline: float) -> Dict:
+        writer, pending = await self._connect()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        pending[request_id] = future
+        try:
+            writer.write(
+                json.dumps({
+                    "id": request_id,
+                    "message": message,
+                    "language": language,
+                    "deadline": deadline
+                }).encode() + b"\n"
+            )
+            await writer.drain()
+            return await future
+        finally:
+            pending.pop(request_id, None)
+
+    async def analyze_message(self, message: str, language: str = DEFAULT_LANGUAGE) -> Dict:
+        """Analyze via the inference pool, or in-process when worker mode is off"""
+        if not settings.AI_WORKER_MODE:
+            return await ai_service.analyze_message(message, language)
+
+        try:
+            # Same host, so wall-clock deadlines are comparable on both sides
+            deadline = time.time() + self.timeout
+            return await asyncio.wait_for(
+                self._request(message, language, deadline), self.timeout
+            )
+        except (asyncio.TimeoutError, OSError, RuntimeError) as exc:
+            # Never drop a message (it may contain crisis indicators) because
+            # the pool is slow or down; use the rule-based analysis instead
+            logger.warning("Inference pool unavailable, using local analysis",
+                           error=repr(exc))
+            return await ai_service.analyze_message(message, language)
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+        if self._reader_task:
+            self._reader_task.cancel()
+
+inference_client = InferenceClient()
+
+if __name__ == "__main__":
+    # python -m app.services.inference_pool
+    inference_server = InferenceServer()
+    inference_server.start_workers()
+    sys.exit(asyncio.run(inference_server.serve()))
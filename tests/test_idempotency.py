@@ -0,0 +1,216 @@
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException
+from app.core import idempotency as idempotency_module
+from app.core.cache import CacheManager
+from app.core.config import settings
+from app.core.idempotency import IdempotencyManager
+
+class FakeCache:
+    """In-memory stand-in for CacheManager, shared like Redis across managers.
+
+    Every call yields to the event loop, as a real Redis round trip does.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.lock_attempts = 0
+
+    async def get(self, key):
+        await asyncio.sleep(0)
+        value = self.store.get(key)
+        return json.loads(value) if value else None
+
+    async def get_raw(self, key):
+        await asyncio.sleep(0)
+        return self.store.get(key)
+
+    async def set(self, key, value, expire=None):
+        await asyncio.sleep(0)
+        self.store[key] = json.dumps(value)
+
+    async def set_nx(self, key, value, expire):
+        self.lock_attempts += 1
+        await asyncio.sleep(0)
+        if key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+    async def delete(self, key):
+        await asyncio.sleep(0)
+        self.store.pop(key, None)
+
+    async def delete_if_equals(self, key, value):
+        await asyncio.sleep(0)
+        if self.store.get(key) == value:
+            del self.store[key]
+
+class BrokenRedis:
+    def __getattr__(self, name):
+        async def fail(*args, **kwargs):
+            await asyncio.sleep(0)
+            raise ConnectionError("Redis is down")
+        return fail
+
+@pytest.fixture
+def fake_cache(monkeypatch):
+    fake = FakeCache()
+    monkeypatch.setattr(idempotency_module, "cache", fake)
+    monkeypatch.setattr(idempotency_module, "POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_SECONDS", 1)
+    return fake
+
+def make_handler(calls, body=b'{"ok":true}', delay=0.05, error=None):
+    async def handler():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        return body
+    return handler
+
+def test_concurrent_duplicates_run_handler_once(fake_cache):
+    manager = IdempotencyManager()
+    calls, waits = [], []
+
+    async def before_wait():
+        waits.append(1)
+
+    async def scenario():
+        handler = make_handler(calls)
+        return await asyncio.gather(
+            manager.run("k", "fp", handler, before_wait),
+            manager.run("k", "fp", handler, before_wait),
+            manager.run("k", "fp", handler, before_wait),
+        )
+
+    assert asyncio.run(scenario()) == [b'{"ok":true}'] * 3
+    assert len(calls) == 1
+    assert len(waits) == 2
+    # Duplicates awaited the in-process future instead of polling Redis
+    assert fake_cache.lock_attempts == 1
+    assert "idempotency:k:lock" not in fake_cache.store
+
+def test_completed_response_is_replayed(fake_cache):
+    manager = IdempotencyManager()
+    calls = []
+
+    async def scenario():
+        first = await manager.run("k", "fp", make_handler(calls))
+        second = await manager.run("k", "fp", make_handler(calls))
+        return first, second
+
+    assert asyncio.run(scenario()) == (b'{"ok":true}', b'{"ok":true}')
+    assert len(calls) == 1
+
+def test_fingerprint_mismatch_is_rejected(fake_cache):
+    manager = IdempotencyManager()
+    calls = []
+
+    async def scenario():
+        await manager.run("k", "fp", make_handler(calls))
+        await manager.run("k", "other", make_handler(calls))
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(scenario())
+    assert exc_info.value.status_code == 422
+    assert len(calls) == 1
+
+def test_failed_first_execution_gives_duplicates_409(fake_cache):
+    manager = IdempotencyManager()
+    calls = []
+
+    async def scenario():
+        handler = make_handler(calls, error=RuntimeError("analysis failed"))
+        return await asyncio.gather(
+            manager.run("k", "fp", handler),
+            manager.run("k", "fp", handler),
+            return_exceptions=True,
+        )
+
+    first, duplicate = asyncio.run(scenario())
+    assert isinstance(first, RuntimeError)
+    assert isinstance(duplicate, HTTPException) and duplicate.status_code == 409
+    assert len(calls) == 1
+    assert "idempotency:k:lock" not in fake_cache.store
+
+def test_waits_for_execution_in_another_worker(fake_cache):
+    manager = IdempotencyManager()
+    calls = []
+    fake_cache.store["idempotency:k:lock"] = "fp"
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.05)
+        await fake_cache.set("idempotency:k:result", {"fingerprint": "fp", "body": "{}"})
+        await fake_cache.delete("idempotency:k:lock")
+
+    async def scenario():
+        body, _ = await asyncio.gather(
+            manager.run("k", "fp", make_handler(calls)), other_worker_finishes()
+        )
+        return body
+
+    assert asyncio.run(scenario()) == b"{}"
+    assert calls == []
+
+def test_failure_in_another_worker_gives_409(fake_cache):
+    manager = IdempotencyManager()
+    fake_cache.store["idempotency:k:lock"] = "fp"
+
+    async def other_worker_fails():
+        await asyncio.sleep(0.05)
+        await fake_cache.delete("idempotency:k:lock")
+
+    async def scenario():
+        await asyncio.gather(manager.run("k", "fp", make_handler([])), other_worker_fails())
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(scenario())
+    assert exc_info.value.status_code == 409
+
+def test_redis_down_fails_open(monkeypatch):
+    broken = CacheManager()
+    broken.redis_client = BrokenRedis()
+    monkeypatch.setattr(idempotency_module, "cache", broken)
+    manager = IdempotencyManager()
+    calls = []
+
+    body = asyncio.run(manager.run("k", "fp", make_handler(calls)))
+    assert body == b'{"ok":true}'
+    assert len(calls) == 1
+
+def test_redis_down_still_coalesces_concurrent_duplicates(monkeypatch):
+    broken = CacheManager()
+    broken.redis_client = BrokenRedis()
+    monkeypatch.setattr(idempotency_module, "cache", broken)
+    manager = IdempotencyManager()
+    calls = []
+
+    async def scenario():
+        handler = make_handler(calls)
+        return await asyncio.gather(*(manager.run("k", "fp", handler) for _ in range(3)))
+
+    assert asyncio.run(scenario()) == [b'{"ok":true}'] * 3
+    assert len(calls) == 1
+
+def test_handler_is_bounded_by_lock_time(fake_cache, monkeypatch):
+    monkeypatch.setattr(settings, "IDEMPOTENCY_LOCK_SECONDS", 0.05)
+    manager = IdempotencyManager()
+
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(manager.run("k", "fp", make_handler([], delay=1)))
+    assert exc_info.value.status_code == 504
+    assert "idempotency:k:lock" not in fake_cache.store
+
+def test_lock_taken_over_by_another_worker_is_not_released(fake_cache):
+    manager = IdempotencyManager()
+
+    async def handler():
+        # Simulate our lock expiring and another worker claiming the key
+        fake_cache.store["idempotency:k:lock"] = "other-worker"
+        return b"{}"
+
+    asyncio.run(manager.run("k", "fp", handler))
+    assert fake_cache.store["idempotency:k:lock"] == "other-worker"